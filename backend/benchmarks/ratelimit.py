@@ -0,0 +1,58 @@
+"""Microbenchmark the in-memory rate limiter.
+
+Run from ``backend/``:
+
+    python -m benchmarks.ratelimit [--keys 10000] [--iterations 1000000]
+
+Reports the per-call cost of ``MemoryBackend.take`` and of the async
+``hit`` wrapper the request path awaits, plus the cost under a flood of
+distinct clients once the backend is at ``MAX_KEYS`` and evicting.
+"""
+import argparse
+import asyncio
+import time
+
+from ratelimit import MemoryBackend, RateLimit
+
+
+def bench_take(backend: MemoryBackend, keys: list, limit: RateLimit, iterations: int) -> float:
+    n = len(keys)
+    start = time.perf_counter()
+    for i in range(iterations):
+        backend.take(keys[i % n], limit)
+    return (time.perf_counter() - start) / iterations
+
+
+async def bench_hit(backend: MemoryBackend, keys: list, limit: RateLimit, iterations: int) -> float:
+    n = len(keys)
+    start = time.perf_counter()
+    for i in range(iterations):
+        await backend.hit(keys[i % n], limit)
+    return (time.perf_counter() - start) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    limit = RateLimit(burst=60, period=60)
+    keys = [f"swappable_slots:user-{i}" for i in range(args.keys)]
+
+    backend = MemoryBackend()
+    per_take = bench_take(backend, keys, limit, args.iterations)
+    per_hit = asyncio.run(bench_hit(backend, keys, limit, args.iterations))
+
+    print(f"take()  {per_take * 1e6:6.3f} us/call  ({args.keys} keys, {args.iterations} calls)")
+    print(f"hit()   {per_hit * 1e6:6.3f} us/call")
+
+    flood = MemoryBackend()
+    flood_keys = [f"login:10.0.{i // 65536}.{i % 65536}" for i in range(2 * MemoryBackend.MAX_KEYS)]
+    per_flood = bench_take(flood, flood_keys, limit, len(flood_keys))
+    print(f"flood   {per_flood * 1e6:6.3f} us/call  ({len(flood_keys)} distinct keys, "
+          f"{MemoryBackend.MAX_KEYS} kept)")
+
+
+if __name__ == "__main__":
+    main()
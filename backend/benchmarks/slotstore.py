@@ -0,0 +1,115 @@
+"""Compare SlotStore with the list-of-dicts representation.
+
+Run from ``backend/``:
+
+    python -m benchmarks.slotstore [--slots 100000] [--users 2000]
+
+Reports the memory held by each representation (via tracemalloc) and the
+time to answer the marketplace query "swappable slots not owned by user X
+overlapping a one-week window".
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import recurrence
+from slotstore import STATUSES, SlotStore
+
+TITLES = ["Morning shift", "Evening shift", "Night shift", "On call", "Standup", "Lab"]
+
+
+def make_events(n: int, users: int, seed: int = 0):
+    # Ids come from the seeded rng so both representations hold the same slots
+    rng = random.Random(seed)
+
+    def new_id():
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    user_ids = [new_id() for _ in range(users)]
+    base = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    created = base.isoformat()
+    for _ in range(n):
+        start = base + timedelta(hours=rng.randrange(24 * 365))
+        yield {
+            "id": new_id(),
+            "user_id": rng.choice(user_ids),
+            "title": rng.choice(TITLES),
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=rng.choice((1, 4, 8)))).isoformat(),
+            "status": rng.choice(STATUSES),
+            "created_at": created,
+        }
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def query_dicts(events, me, window_start, window_end):
+    return [
+        e for e in events
+        if e["status"] == "SWAPPABLE" and e["user_id"] != me
+        and recurrence.parse_time(e["end_time"]) > window_start
+        and recurrence.parse_time(e["start_time"]) < window_end
+    ]
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--slots", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    args = parser.parse_args()
+
+    events, dicts_bytes = measure(lambda: list(make_events(args.slots, args.users)))
+    store, store_bytes = measure(lambda: SlotStore.from_events(make_events(args.slots, args.users)))
+
+    me = events[0]["user_id"]
+    window_start = datetime(2030, 6, 1, tzinfo=timezone.utc)
+    window_end = window_start + timedelta(days=7)
+
+    expected = {e["id"] for e in query_dicts(events, me, window_start, window_end)}
+    selected = store.select(
+        status="SWAPPABLE",
+        exclude_user_id=me,
+        start=window_start.timestamp(),
+        end=window_end.timestamp(),
+    )
+    assert expected == {store.event_id(row) for row in selected}, "queries disagree"
+
+    dicts_time = best_of(lambda: query_dicts(events, me, window_start, window_end))
+    store_time = best_of(lambda: store.select(
+        status="SWAPPABLE",
+        exclude_user_id=me,
+        start=window_start.timestamp(),
+        end=window_end.timestamp(),
+    ))
+
+    print(f"{args.slots} slots, {args.users} users, {len(expected)} rows per query")
+    print(f"memory  list of dicts {dicts_bytes / 2**20:8.1f} MiB")
+    print(f"        SlotStore     {store_bytes / 2**20:8.1f} MiB  "
+          f"(columns {store.nbytes() / 2**20:.1f} MiB)")
+    print(f"query   list of dicts {dicts_time * 1e3:8.2f} ms")
+    print(f"        SlotStore     {store_time * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
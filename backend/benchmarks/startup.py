@@ -0,0 +1,65 @@
+"""Measure worker cold-start time.
+
+Run from ``backend/``:
+
+    python -m benchmarks.startup [--runs 10] [--lifespan]
+
+Each run uses a fresh interpreter so module import cost is included. With
+``--lifespan`` the full startup (Mongo connection, index creation, bcrypt
+warm-up) is also timed, which needs a reachable ``MONGO_URL``.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+PROBE = '''
+import asyncio, time
+t0 = time.perf_counter()
+import server
+t1 = time.perf_counter()
+lifespan = {lifespan}
+if lifespan:
+    async def _start():
+        async with server.lifespan(server.app):
+            return time.perf_counter()
+    t2 = asyncio.run(_start())
+else:
+    t2 = t1
+print(f"{{(t1 - t0) * 1000:.3f}} {{(t2 - t1) * 1000:.3f}}")
+'''
+
+
+def run_once(lifespan: bool) -> tuple:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(lifespan=lifespan)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip().splitlines()[-1]
+    import_ms, lifespan_ms = (float(x) for x in out.split())
+    return import_ms, lifespan_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--lifespan", action="store_true")
+    args = parser.parse_args()
+
+    results = [run_once(args.lifespan) for _ in range(args.runs)]
+    imports = [r[0] for r in results]
+    print(f"import server   median {statistics.median(imports):8.2f} ms  "
+          f"min {min(imports):8.2f} ms  ({args.runs} runs)")
+    if args.lifespan:
+        startups = [r[1] for r in results]
+        print(f"lifespan start  median {statistics.median(startups):8.2f} ms  "
+              f"min {min(startups):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Dashboard summary.
+
+``GET /api/dashboard`` runs the counts aggregation and the upcoming-event
+queries; this module turns their raw results into the response, so the
+shaping can be tested without Mongo.
+"""
+import heapq
+import itertools
+from datetime import datetime
+from typing import Iterable, List
+
+import recurrence
+
+STATUSES = ("BUSY", "SWAPPABLE", "SWAP_PENDING")
+
+
+def facet_count(facets: dict, name: str) -> int:
+    # $count emits no document at all when nothing matched
+    return facets[name][0]["count"] if facets.get(name) else 0
+
+
+def status_counts(facets: dict) -> dict:
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update({row["_id"]: row["count"] for row in facets.get("status_counts", [])})
+    return counts
+
+
+def next_occurrences(series: Iterable[dict], now: datetime, window_end: datetime, limit: int) -> List[dict]:
+    """Up to ``limit`` occurrences of each series in [now, window_end)."""
+    occurrences = []
+    for s in series:
+        occurrences.extend(itertools.islice(recurrence.iter_occurrences(s, now, window_end), limit))
+    return occurrences
+
+
+def upcoming(events: Iterable[dict], now: datetime, limit: int) -> List[dict]:
+    """The first ``limit`` events starting at or after ``now``, soonest first.
+
+    Events whose ``start_time`` can't be parsed are skipped rather than
+    failing the whole dashboard.
+    """
+    timed = []
+    for event in events:
+        start = recurrence.epoch(event.get("start_time"))
+        if start is not None and start >= now.timestamp():
+            timed.append((start, event))
+    return [event for _, event in heapq.nsmallest(limit, timed, key=lambda pair: pair[0])]
+
+
+def summarize(facets: dict, events: Iterable[dict], now: datetime, limit: int) -> dict:
+    return {
+        "status_counts": status_counts(facets),
+        "recurring_series": facet_count(facets, "recurring_series"),
+        "upcoming": upcoming(events, now, limit),
+        "pending_swaps": {
+            "incoming": facet_count(facets, "incoming_pending"),
+            "outgoing": facet_count(facets, "outgoing_pending"),
+        },
+    }
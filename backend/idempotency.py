@@ -0,0 +1,163 @@
+"""Idempotency-Key support for mutating endpoints.
+
+The first request carrying a key reserves it in the ``idempotency_keys``
+collection (unique id, TTL index), runs, and stores its response as compact
+JSON. Retries with the same key replay that response instead of running the
+handler again. Completed responses are also kept in a small per-worker LRU
+so most retries never reach Mongo.
+
+A reservation is only a lease: if the request holding it dies, or never
+manages to store its response, a retry after ``lease_seconds`` takes the key
+over instead of getting 409 until the key expires. A live holder keeps its
+lease with ``keep_alive``, and every write is fenced by the token ``begin``
+handed out, so a holder that lost the key can't overwrite or release it.
+Takeover can still run the handler twice if a holder stalls for longer than
+the lease without renewing it (e.g. a blocked event loop); its late
+``complete`` is then discarded and the retry's response is the one replayed.
+"""
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    pass
+
+
+class KeyInProgress(IdempotencyError):
+    """Another request with the same key has not finished yet."""
+
+
+class KeyReused(IdempotencyError):
+    """The key was already used for a request with a different payload."""
+
+
+def fingerprint(payload: str) -> str:
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        collection,
+        ttl_seconds: int = 24 * 3600,
+        lease_seconds: int = 30,
+        front_size: int = 10_000,
+    ):
+        self._collection = collection
+        self._ttl = ttl_seconds
+        self._lease = timedelta(seconds=lease_seconds)
+        self._front_size = front_size
+        self._front = OrderedDict()  # id -> (expires at, fingerprint, status code, body)
+
+    async def ensure_indexes(self) -> None:
+        await self._collection.create_index("id", unique=True)
+        await self._collection.create_index("created_at", expireAfterSeconds=self._ttl)
+
+    async def begin(
+        self, scope: str, key: str, request_fingerprint: str
+    ) -> Tuple[Optional[str], Optional[Tuple[int, str]]]:
+        """Reserve ``key``.
+
+        Returns ``(token, None)`` when this request now holds the key, or
+        ``(None, (status code, JSON body))`` when it already completed.
+        """
+        doc_id = f"{scope}:{key}"
+        cached = self._front.get(doc_id)
+        if cached and cached[0] > time.monotonic():
+            self._front.move_to_end(doc_id)
+            return None, self._check(cached[1], request_fingerprint, cached[2], cached[3])
+
+        now = datetime.now(timezone.utc)
+        token = uuid.uuid4().hex
+        try:
+            await self._collection.insert_one({
+                "id": doc_id,
+                "token": token,
+                "fingerprint": request_fingerprint,
+                "status_code": None,
+                "response": None,
+                "locked_until": now + self._lease,
+                "created_at": now,
+            })
+            return token, None
+        except DuplicateKeyError:
+            pass
+
+        doc = await self._collection.find_one({"id": doc_id}, {"_id": 0})
+        if doc is None:
+            # Expired between the insert attempt and the lookup
+            return await self.begin(scope, key, request_fingerprint)
+        if doc["status_code"] is None:
+            # Take over a reservation whose lease has run out; the filter makes
+            # sure only one retry wins.
+            taken = await self._collection.update_one(
+                {"id": doc_id, "status_code": None, "locked_until": {"$lte": now}},
+                {"$set": {
+                    "token": token,
+                    "fingerprint": request_fingerprint,
+                    "locked_until": now + self._lease,
+                    "created_at": now,
+                }}
+            )
+            if taken.modified_count:
+                return token, None
+            raise KeyInProgress()
+        self._remember(doc_id, doc["fingerprint"], doc["status_code"], doc["response"])
+        return None, self._check(doc["fingerprint"], request_fingerprint, doc["status_code"], doc["response"])
+
+    async def renew(self, scope: str, key: str, token: str) -> bool:
+        """Extend the lease; False if ``token`` no longer holds the key."""
+        renewed = await self._collection.update_one(
+            {"id": f"{scope}:{key}", "token": token, "status_code": None},
+            {"$set": {"locked_until": datetime.now(timezone.utc) + self._lease}}
+        )
+        return bool(renewed.modified_count)
+
+    async def keep_alive(self, scope: str, key: str, token: str) -> None:
+        """Renew the lease until cancelled, or until the key is lost."""
+        while True:
+            await asyncio.sleep(self._lease.total_seconds() / 3)
+            if not await self.renew(scope, key, token):
+                return
+
+    async def complete(
+        self, scope: str, key: str, token: str, request_fingerprint: str, status_code: int, body
+    ) -> bool:
+        """Store the response; False if the key was taken over meanwhile."""
+        doc_id = f"{scope}:{key}"
+        response = json.dumps(body, separators=(",", ":"))
+        stored = await self._collection.update_one(
+            {"id": doc_id, "token": token, "status_code": None},
+            {"$set": {"status_code": status_code, "response": response}}
+        )
+        if not stored.modified_count:
+            return False
+        self._remember(doc_id, request_fingerprint, status_code, response)
+        return True
+
+    async def abandon(self, scope: str, key: str, token: str) -> None:
+        # A failed attempt must not block the client from retrying, but only
+        # releases the key if it still holds it
+        await self._collection.delete_one({"id": f"{scope}:{key}", "token": token, "status_code": None})
+
+    def _remember(self, doc_id: str, request_fingerprint: str, status_code: int, response: str) -> None:
+        self._front[doc_id] = (time.monotonic() + self._ttl, request_fingerprint, status_code, response)
+        self._front.move_to_end(doc_id)
+        while len(self._front) > self._front_size:
+            self._front.popitem(last=False)
+
+    @staticmethod
+    def _check(stored: str, received: str, status_code: int, response: str) -> Tuple[int, str]:
+        if stored != received:
+            raise KeyReused()
+        return status_code, response
@@ -0,0 +1,121 @@
+"""Token-bucket rate limiting.
+
+Each (route, client) pair gets a bucket holding up to ``burst`` tokens that
+refills at ``burst / period`` tokens per second; a request spends one token
+or is rejected with the number of seconds until one is available.
+
+Buckets live in a backend. ``MemoryBackend`` is per-process and is what a
+single worker uses; ``MongoBackend`` keeps buckets in a shared collection so
+limits hold across every worker started by ``run.py``. Anything with an
+async ``hit(key, limit)`` method can be plugged in instead.
+"""
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    burst: int
+    period: float  # seconds to refill a full bucket
+
+    def __post_init__(self):
+        # A zero rate would make every rejection divide by zero
+        if self.burst < 1 or not 0 < self.period < math.inf:
+            raise ValueError(
+                f"Invalid rate limit {self.burst}/{self.period:g}: "
+                "requests must be at least 1 and seconds greater than 0"
+            )
+
+    @property
+    def rate(self) -> float:
+        return self.burst / self.period
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        """Parse ``"<requests>/<seconds>"``, e.g. ``"10/60"``."""
+        burst, _, period = value.partition("/")
+        try:
+            burst, period = int(burst), float(period or 1)
+        except ValueError:
+            raise ValueError(f'Invalid rate limit {value!r}, expected "<requests>/<seconds>"')
+        return cls(burst=burst, period=period)
+
+
+class MemoryBackend:
+    # Least recently used buckets are evicted beyond this many keys, so a
+    # flood of distinct clients costs O(1) per request and bounded memory.
+    # An evicted client simply starts again with a full bucket.
+    MAX_KEYS = 100_000
+
+    def __init__(self, clock=time.monotonic, max_keys: int = MAX_KEYS):
+        self._clock = clock
+        self._max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last refill time]
+
+    def take(self, key: str, limit: RateLimit) -> float:
+        """Spend a token; return 0.0 if allowed, else seconds to wait."""
+        now = self._clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self._max_keys:
+                self._buckets.popitem(last=False)
+            self._buckets[key] = [limit.burst - 1.0, now]
+            return 0.0
+
+        self._buckets.move_to_end(key)
+        tokens = bucket[0] + (now - bucket[1]) * limit.rate
+        if tokens > limit.burst:
+            tokens = limit.burst
+        bucket[1] = now
+        if tokens >= 1.0:
+            bucket[0] = tokens - 1.0
+            return 0.0
+        bucket[0] = tokens
+        return (1.0 - tokens) / limit.rate
+
+    async def hit(self, key: str, limit: RateLimit) -> float:
+        return self.take(key, limit)
+
+
+class MongoBackend:
+    """Buckets shared by all workers, updated atomically in one round trip."""
+
+    def __init__(self, collection, clock=time.time):
+        self._collection = collection
+        self._clock = clock
+
+    async def ensure_indexes(self) -> None:
+        await self._collection.create_index("key", unique=True)
+        await self._collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def hit(self, key: str, limit: RateLimit) -> float:
+        now = self._clock()
+        refilled = {"$min": [
+            limit.burst,
+            {"$add": [
+                {"$ifNull": ["$tokens", limit.burst]},
+                {"$multiply": [{"$subtract": [now, {"$ifNull": ["$ts", now]}]}, limit.rate]},
+            ]},
+        ]}
+        bucket = await self._collection.find_one_and_update(
+            {"key": key},
+            [
+                {"$set": {"tokens": refilled, "ts": now}},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {
+                    "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "expires_at": datetime.now(timezone.utc) + timedelta(seconds=limit.period),
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            projection={"_id": 0, "tokens": 1, "allowed": 1},
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (1.0 - bucket["tokens"]) / limit.rate
@@ -0,0 +1,224 @@
+"""Recurring slots.
+
+A recurring slot is stored once, as a *series* document in ``events`` with an
+RRULE string in ``recurrence``. Its occurrences are never stored up front:
+they are generated on demand for the time window a listing asks for.
+
+Each occurrence has a stable id ``<series id>@<UTC start stamp>`` so clients
+can edit, delete or swap it like any other event. It only becomes a real
+document (``series_id`` / ``original_start`` set) once it is edited or
+swapped, and its stamp is then added to the series' ``exdates`` so the
+generator stops producing it.
+"""
+import itertools
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional, Tuple
+
+OCCURRENCE_SEP = "@"
+STAMP_FORMAT = "%Y%m%dT%H%M%SZ"
+
+# Shift-style slots repeat daily at most; finer rules would make expansion
+# windows arbitrarily expensive.
+ALLOWED_FREQS = {"DAILY", "WEEKLY", "MONTHLY", "YEARLY"}
+MAX_COUNT = 1000
+MAX_INTERVAL = 100
+
+# dateutil only checks UNTIL against occurrences it has found, so a rule that
+# never (or very rarely) matches scans period by period up to year 9999. Only
+# parts that guarantee a match in (nearly) every period are accepted: no
+# BYMONTH/BYMONTHDAY/BYSETPOS/..., BYDAY positions within +-4, and no BYDAY
+# on DAILY rules, where an INTERVAL can step over the chosen weekdays forever.
+ALLOWED_PARTS = {"FREQ", "INTERVAL", "COUNT", "UNTIL", "BYDAY", "WKST"}
+BYDAY_RE = re.compile(r"^([+-]?[1-4])?(MO|TU|WE|TH|FR|SA|SU)$")
+
+# Fields only used for storage / querying, never returned to clients
+INTERNAL_FIELDS = ("_id", "start_ts", "end_ts", "recurrence_start_ts", "recurrence_end_ts")
+
+
+def parse_time(value: str) -> datetime:
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def format_time(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).isoformat()
+
+
+def stamp(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime(STAMP_FORMAT)
+
+
+def occurrence_id(series_id: str, start: datetime) -> str:
+    return f"{series_id}{OCCURRENCE_SEP}{stamp(start)}"
+
+
+def split_occurrence_id(event_id: str) -> Optional[Tuple[str, datetime]]:
+    series_id, sep, raw = event_id.rpartition(OCCURRENCE_SEP)
+    if not sep or not series_id:
+        return None
+    try:
+        start = datetime.strptime(raw, STAMP_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return series_id, start
+
+
+def epoch(value: str) -> Optional[float]:
+    """Epoch seconds of an ISO timestamp, or None if it can't be parsed."""
+    try:
+        return parse_time(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rule(recurrence: str) -> dict:
+    """Validate an RRULE and return its parts, upper-cased."""
+    rule = recurrence.strip()
+    if rule.upper().startswith("RRULE:"):
+        rule = rule[len("RRULE:"):]
+    parts = {}
+    for part in filter(None, rule.split(";")):
+        key, _, value = part.partition("=")
+        parts[key.strip().upper()] = value.strip().upper()
+
+    unsupported = set(parts) - ALLOWED_PARTS
+    if unsupported:
+        raise ValueError(f"Unsupported recurrence parts: {', '.join(sorted(unsupported))}")
+    if parts.get("FREQ") not in ALLOWED_FREQS:
+        raise ValueError(f"FREQ must be one of {', '.join(sorted(ALLOWED_FREQS))}")
+    try:
+        interval = int(parts.get("INTERVAL", "1"))
+        count = int(parts.get("COUNT", "1"))
+    except ValueError:
+        raise ValueError("INTERVAL and COUNT must be integers")
+    if not 1 <= interval <= MAX_INTERVAL:
+        raise ValueError(f"INTERVAL must be between 1 and {MAX_INTERVAL}")
+    if not 1 <= count <= MAX_COUNT:
+        raise ValueError(f"COUNT must be between 1 and {MAX_COUNT}")
+    if "BYDAY" in parts:
+        if parts["FREQ"] == "DAILY":
+            raise ValueError("BYDAY is not supported with FREQ=DAILY; use FREQ=WEEKLY")
+        if not all(BYDAY_RE.match(day) for day in parts["BYDAY"].split(",")):
+            raise ValueError("BYDAY must list weekdays, optionally with a position from -4 to 4")
+    return parts
+
+
+def build_rule(recurrence, start: datetime):
+    """dateutil rule for ``recurrence`` (an RRULE string or ``parse_rule`` parts)."""
+    # dateutil is only needed once a recurring slot is actually touched
+    from dateutil.rrule import rrulestr
+
+    parts = parse_rule(recurrence) if isinstance(recurrence, str) else recurrence
+    try:
+        return rrulestr(";".join(f"{k}={v}" for k, v in parts.items()), dtstart=start)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid recurrence rule: {e}")
+
+
+def fast_forward(parts: dict, start: datetime, target: datetime) -> datetime:
+    """The latest start on or before ``target`` a whole number of periods after ``start``.
+
+    dateutil always iterates from the rule's start, so expanding a window of
+    a years-old series would walk every period since. Restarting the rule a
+    whole number of periods later produces the same dates from there on
+    (same weekday, day of month and INTERVAL phase), so expansion costs what
+    the window costs. COUNT rules are left alone: moving their start would
+    change which dates are counted, and they are short anyway.
+    """
+    if "COUNT" in parts or target <= start:
+        return start
+    interval = int(parts.get("INTERVAL", "1"))
+    if parts["FREQ"] in ("DAILY", "WEEKLY"):
+        period = timedelta(days=interval * (7 if parts["FREQ"] == "WEEKLY" else 1))
+        return start + period * ((target - start) // period)
+
+    step = interval * (12 if parts["FREQ"] == "YEARLY" else 1)
+    periods = ((target.year - start.year) * 12 + target.month - start.month) // step
+    for k in range(periods, 0, -1):
+        month = start.month - 1 + k * step
+        try:
+            candidate = start.replace(year=start.year + month // 12, month=month % 12 + 1)
+        except ValueError:
+            continue  # e.g. the 31st in a 30-day month
+        if candidate <= target:
+            return candidate
+    return start
+
+
+def series_bounds(series: dict) -> Tuple[float, Optional[float]]:
+    """Epoch range covered by a series; the end is None for unbounded rules.
+
+    Stored on the series document so listings can skip series that cannot
+    intersect the requested window without expanding them.
+    """
+    start = parse_time(series["start_time"])
+    duration = parse_time(series["end_time"]) - start
+    rule = build_rule(series["recurrence"], start)
+
+    rule_text = series["recurrence"].upper()
+    if "COUNT=" not in rule_text and "UNTIL=" not in rule_text:
+        return start.timestamp(), None
+
+    # Walk at most MAX_COUNT occurrences; a longer UNTIL series is stored as
+    # unbounded, which only means listings can't skip it by its end.
+    occurrences = list(itertools.islice(rule, MAX_COUNT + 1))
+    if len(occurrences) > MAX_COUNT:
+        return start.timestamp(), None
+    if not occurrences:
+        return start.timestamp(), start.timestamp()
+    return start.timestamp(), (occurrences[-1] + duration).timestamp()
+
+
+def _occurrence(series: dict, start: datetime, duration) -> dict:
+    occurrence = {k: v for k, v in series.items() if k not in INTERNAL_FIELDS}
+    occurrence.update({
+        "id": occurrence_id(series["id"], start),
+        "start_time": format_time(start),
+        "end_time": format_time(start + duration),
+        "recurrence": None,
+        "exdates": [],
+        "series_id": series["id"],
+        "original_start": format_time(start),
+    })
+    return occurrence
+
+
+def iter_occurrences(series: dict, window_start: datetime, window_end: datetime) -> Iterator[dict]:
+    """Yield the occurrences of ``series`` overlapping [window_start, window_end)."""
+    start = parse_time(series["start_time"])
+    duration = parse_time(series["end_time"]) - start
+    parts = parse_rule(series["recurrence"])
+    rule = build_rule(parts, fast_forward(parts, start, window_start - duration))
+    skipped = set(series.get("exdates") or [])
+
+    # Listing windows are capped well below MAX_COUNT days, so this limit is
+    # only a backstop against runaway expansion.
+    candidates = itertools.islice(rule.xafter(window_start - duration, inc=False), MAX_COUNT)
+    for occurrence_start in candidates:
+        if occurrence_start >= window_end:
+            break
+        if stamp(occurrence_start) in skipped:
+            continue
+        yield _occurrence(series, occurrence_start, duration)
+
+
+def occurrence_at(series: dict, start: datetime) -> Optional[dict]:
+    """The occurrence of ``series`` starting exactly at ``start``, if any."""
+    if stamp(start) in set(series.get("exdates") or []):
+        return None
+    # Stored bounds reject ids outside the series without expanding it
+    start_ts, end_ts = series.get("recurrence_start_ts"), series.get("recurrence_end_ts")
+    if start_ts is not None and start.timestamp() < start_ts:
+        return None
+    if end_ts is not None and start.timestamp() >= end_ts:
+        return None
+    series_start = parse_time(series["start_time"])
+    duration = parse_time(series["end_time"]) - series_start
+    parts = parse_rule(series["recurrence"])
+    rule = build_rule(parts, fast_forward(parts, series_start, start))
+    if rule.after(start, inc=True) != start:
+        return None
+    return _occurrence(series, start, duration)
@@ -0,0 +1,34 @@
+"""Production launcher: runs the API across several uvicorn worker processes.
+
+Each worker imports ``server`` on its own and opens its MongoDB connection in
+the lifespan handler, so nothing is shared across the fork.
+
+    python run.py                 # WEB_CONCURRENCY workers (default: usable CPUs)
+    WEB_CONCURRENCY=4 PORT=8001 python run.py
+
+Behind a reverse proxy, set FORWARDED_ALLOW_IPS to the proxy's address(es)
+(comma-separated, or "*" if only the proxy can reach the workers) so client
+addresses, and with them per-IP rate limits, come from X-Forwarded-For.
+"""
+import os
+
+import uvicorn
+
+
+def main() -> None:
+    # sched_getaffinity honours container CPU sets, unlike os.cpu_count()
+    workers = int(os.environ.get('WEB_CONCURRENCY', len(os.sched_getaffinity(0))))
+    uvicorn.run(
+        "server:app",
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', '8001')),
+        workers=workers,
+        proxy_headers=True,
+        forwarded_allow_ips=os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1'),
+        # Let in-flight requests finish before the lifespan shutdown runs
+        timeout_graceful_shutdown=int(os.environ.get('GRACEFUL_TIMEOUT', '30')),
+    )
+
+
+if __name__ == "__main__":
+    main()
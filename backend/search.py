@@ -0,0 +1,165 @@
+"""Marketplace search over swappable slots.
+
+``GET /api/swappable-slots/search`` runs two aggregations over ``events``:
+one for the results page and one for the total and facets. Building the
+pipelines and shaping their output lives here so it can be tested without
+Mongo; the route only runs them.
+"""
+from typing import List, Optional
+
+import recurrence
+
+DAYS = ("sun", "mon", "tue", "wed", "thu", "fri", "sat")  # $dayOfWeek 1..7
+DAY_NAMES = ("sunday", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday")
+HOUR_BUCKET = 6  # hours per time-of-day bucket
+# Owners matched by name are passed to the events query in an $in
+MAX_OWNERS = 1000
+
+# Helper fields added by the pipelines, dropped from results
+_HELPER_FIELDS = ("_owner", "_tz_owner", "_start", "_day", "_hour", "_score")
+
+
+def parse_day(day: str) -> int:
+    """$dayOfWeek number (1 is Sunday) of a weekday name or its 3-letter abbreviation."""
+    value = day.strip().lower()
+    for number, names in enumerate(zip(DAYS, DAY_NAMES), start=1):
+        if value in names:
+            return number
+    raise ValueError('day must be a weekday name or abbreviation, e.g. "monday" or "mon"')
+
+
+def build_match(user_id: str, q: Optional[str] = None, owner_ids: Optional[List[str]] = None) -> dict:
+    # Recurring series are left out; see the route's docstring
+    match = {"status": "SWAPPABLE", "user_id": {"$ne": user_id}, "recurrence": None}
+    if q:
+        # Titles match through the events text index, owners by id
+        match["$or"] = [{"$text": {"$search": q}}, {"user_id": {"$in": owner_ids or []}}]
+    return match
+
+
+def owner_timezone_stages(owner_timezone: str) -> list:
+    # Joined per slot on the users (id, timezone) index instead of loading
+    # every user id in the timezone up front
+    return [
+        {"$lookup": {
+            "from": "users",
+            "let": {"owner": "$user_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$id", "$$owner"]}, "timezone": owner_timezone}},
+                {"$project": {"_id": 1}},
+            ],
+            "as": "_tz_owner",
+        }},
+        {"$match": {"_tz_owner": {"$ne": []}}},
+    ]
+
+
+def local_time_stages(tz: str, day: Optional[int] = None, hour: Optional[int] = None) -> list:
+    """Day and hour bucket of each slot start in ``tz``, then the day/hour filters.
+
+    A malformed start_time gives nulls rather than failing the whole search.
+    """
+    stages = [
+        {"$set": {"_start": {"$dateFromString": {
+            "dateString": "$start_time", "onError": None, "onNull": None,
+        }}}},
+        {"$set": {
+            "_day": {"$dayOfWeek": {"date": "$_start", "timezone": tz}},
+            "_hour": {"$toInt": {"$multiply": [
+                {"$floor": {"$divide": [{"$hour": {"date": "$_start", "timezone": tz}}, HOUR_BUCKET]}},
+                HOUR_BUCKET,
+            ]}},
+        }},
+    ]
+    if day is not None:
+        stages.append({"$match": {"_day": day}})
+    if hour is not None:
+        stages.append({"$match": {"_hour": hour - hour % HOUR_BUCKET}})
+    return stages
+
+
+def _filters(tz: str, day: Optional[int], hour: Optional[int], owner_timezone: Optional[str]) -> list:
+    stages = owner_timezone_stages(owner_timezone) if owner_timezone else []
+    if day is not None or hour is not None:
+        stages += local_time_stages(tz, day, hour)
+    return stages
+
+
+def results_pipeline(
+    match: dict,
+    tz: str,
+    offset: int,
+    limit: int,
+    day: Optional[int] = None,
+    hour: Optional[int] = None,
+    owner_timezone: Optional[str] = None,
+    text_search: bool = False,
+) -> list:
+    """One page of results, soonest first (best text match first with ``q``).
+
+    Without q/day/hour/owner_timezone the $sort directly follows the $match
+    and walks the (status, start_ts) index.
+    """
+    pipeline = [{"$match": match}] + _filters(tz, day, hour, owner_timezone)
+    sort = {"start_ts": 1}
+    if text_search:
+        pipeline.append({"$set": {"_score": {"$meta": "textScore"}}})
+        sort = {"_score": -1, "start_ts": 1}
+    return pipeline + [
+        {"$sort": sort},
+        {"$skip": offset},
+        {"$limit": limit},
+        {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "id", "as": "_owner"}},
+        {"$set": {
+            "user_name": {"$arrayElemAt": ["$_owner.name", 0]},
+            "user_email": {"$arrayElemAt": ["$_owner.email", 0]},
+        }},
+        {"$project": {field: 0 for field in _HELPER_FIELDS + recurrence.INTERNAL_FIELDS}},
+    ]
+
+
+def facets_pipeline(
+    match: dict,
+    tz: str,
+    day: Optional[int] = None,
+    hour: Optional[int] = None,
+    owner_timezone: Optional[str] = None,
+) -> list:
+    """Total and facets in one pass; these groups have to see every match anyway."""
+    stages = owner_timezone_stages(owner_timezone) if owner_timezone else []
+    return [{"$match": match}] + stages + local_time_stages(tz, day, hour) + [{"$facet": {
+        "total": [{"$count": "count"}],
+        "day": [{"$group": {"_id": "$_day", "count": {"$sum": 1}}}],
+        "hour": [{"$group": {"_id": "$_hour", "count": {"$sum": 1}}}],
+        # Group by owner first so users are only looked up once each
+        "owner_timezone": [
+            {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+            {"$lookup": {"from": "users", "localField": "_id", "foreignField": "id", "as": "_owner"}},
+            {"$group": {
+                "_id": {"$ifNull": [{"$arrayElemAt": ["$_owner.timezone", 0]}, "UTC"]},
+                "count": {"$sum": "$count"},
+            }},
+        ],
+    }}]
+
+
+def hour_label(hour: int) -> str:
+    return f"{hour:02d}-{hour + HOUR_BUCKET:02d}"
+
+
+def format_facets(facets: dict) -> dict:
+    """Total and facet counts from the facets pipeline's single document.
+
+    Slots whose start_time could not be parsed have no day or hour, so they
+    are counted in the total only.
+    """
+    day_rows = [row for row in facets["day"] if row["_id"] is not None]
+    hour_rows = sorted((row for row in facets["hour"] if row["_id"] is not None), key=lambda row: row["_id"])
+    return {
+        "total": facets["total"][0]["count"] if facets["total"] else 0,
+        "facets": {
+            "day": {DAYS[row["_id"] - 1]: row["count"] for row in day_rows},
+            "hour": {hour_label(row["_id"]): row["count"] for row in hour_rows},
+            "owner_timezone": {row["_id"]: row["count"] for row in facets["owner_timezone"]},
+        },
+    }
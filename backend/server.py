@@ -1,8 +1,13 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from contextlib import asynccontextmanager
+import asyncio
+import math
 import os
 import logging
 from pathlib import Path
@@ -10,28 +15,84 @@ from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import jwt
 from passlib.context import CryptContext
 
+import dashboard
+import recurrence
+import search
+from ratelimit import RateLimit, MemoryBackend, MongoBackend
+import idempotency
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
 # MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# The client is created by the lifespan handler, i.e. inside each worker
+# process after uvicorn has forked, never at import time.
+client: Optional[AsyncIOMotorClient] = None
+db = None
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24
 
+# Recurring slots are expanded only within a bounded window, which has to
+# start within RECURRENCE_HORIZON_DAYS of now
+RECURRENCE_DEFAULT_WINDOW_DAYS = 90
+RECURRENCE_MAX_WINDOW_DAYS = 366
+RECURRENCE_HORIZON_DAYS = 5 * 366
+
+# Event listings are paged by stored document (a series counts once)
+EVENTS_PAGE_SIZE = 1000
+# Projection dropping the fields only used for querying
+INTERNAL_PROJECTION = {field: 0 for field in recurrence.INTERNAL_FIELDS}
+
+# Rate limiting
+# Each limit can be overridden with RATE_LIMIT_<NAME>="<requests>/<seconds>".
+# RATE_LIMIT_BACKEND=mongo shares buckets between workers.
+# Per-IP limits key on the client address, which behind a reverse proxy is
+# only right if the proxy is listed in FORWARDED_ALLOW_IPS (read by run.py);
+# otherwise every client shares the proxy's bucket.
+def rate_limit_setting(name: str, default: str) -> RateLimit:
+    variable = f'RATE_LIMIT_{name.upper()}'
+    try:
+        return RateLimit.parse(os.environ.get(variable, default))
+    except ValueError as e:
+        raise ValueError(f"{variable}: {e}") from None
+
+RATE_LIMITS = {
+    name: rate_limit_setting(name, default)
+    for name, default in {
+        "signup": "5/60",
+        "login": "10/60",
+        "swappable_slots": "30/60",
+        "swap_requests": "60/60",
+        "search": "60/60",
+    }.items()
+}
+
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+rate_limiter = MemoryBackend()
+
+# Idempotency keys expire after IDEMPOTENCY_TTL_HOURS; a request that dies
+# mid-flight blocks retries of its key for at most IDEMPOTENCY_LEASE_SECONDS.
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24'))
+IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', '30'))
+idempotency_store: Optional[idempotency.IdempotencyStore] = None
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
-# Create the main app
-app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
 # Models
@@ -62,12 +123,14 @@ class EventCreate(BaseModel):
     start_time: str  # ISO format timestamp
     end_time: str    # ISO format timestamp
     status: str = "BUSY"
+    recurrence: Optional[str] = None  # RRULE, e.g. "FREQ=WEEKLY;COUNT=10"
 
 class EventUpdate(BaseModel):
     title: Optional[str] = None
     start_time: Optional[str] = None
     end_time: Optional[str] = None
     status: Optional[str] = None
+    recurrence: Optional[str] = None
 
 class Event(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -77,6 +140,10 @@ class Event(BaseModel):
     start_time: str
     end_time: str
     status: str = "BUSY"
+    recurrence: Optional[str] = None
+    exdates: List[str] = []  # occurrence stamps no longer generated from the series
+    series_id: Optional[str] = None  # set on occurrences of a recurring series
+    original_start: Optional[str] = None
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class SwapRequestCreate(BaseModel):
@@ -127,8 +194,190 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def recurrence_window(start: Optional[str], end: Optional[str]):
+    try:
+        window_start = recurrence.parse_time(start) if start else datetime.now(timezone.utc)
+        window_end = (
+            recurrence.parse_time(end) if end
+            else window_start + timedelta(days=RECURRENCE_DEFAULT_WINDOW_DAYS)
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid time window")
+    if window_end <= window_start:
+        raise HTTPException(status_code=400, detail="Window end must be after its start")
+    if window_end - window_start > timedelta(days=RECURRENCE_MAX_WINDOW_DAYS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Window may not exceed {RECURRENCE_MAX_WINDOW_DAYS} days"
+        )
+    if abs(window_start - datetime.now(timezone.utc)) > timedelta(days=RECURRENCE_HORIZON_DAYS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Window must start within {RECURRENCE_HORIZON_DAYS} days of now"
+        )
+    return window_start, window_end
+
+def series_overlapping(window_start: datetime, window_end: datetime) -> dict:
+    # Series that cannot produce an occurrence in the window are filtered out
+    # by Mongo, without expanding them.
+    return {
+        "recurrence": {"$ne": None},
+        "recurrence_start_ts": {"$lt": window_end.timestamp()},
+        "$or": [
+            {"recurrence_end_ts": None},
+            {"recurrence_end_ts": {"$gt": window_start.timestamp()}},
+        ],
+    }
+
+async def find_events_in_window(
+    query: dict,
+    window_start: datetime,
+    window_end: datetime,
+    offset: int = 0,
+    limit: int = EVENTS_PAGE_SIZE,
+    window_singles: bool = True
+):
+    """One page of events matching ``query``, with series expanded in the window.
+
+    Pages are over stored documents ordered by start, so a series counts once
+    however many occurrences it has. Returns the events and the offset of the
+    next page, which is None on the last one. ``window_singles=False`` returns
+    single events whatever their time.
+    """
+    singles = {"recurrence": None}
+    if window_singles:
+        singles["start_ts"] = {"$lt": window_end.timestamp()}
+        singles["end_ts"] = {"$gt": window_start.timestamp()}
+    docs = await db.events.find(
+        {**query, "$or": [singles, series_overlapping(window_start, window_end)]}, {"_id": 0}
+    ).sort([("start_ts", 1), ("id", 1)]).skip(offset).limit(limit + 1).to_list(limit + 1)
+    next_offset = offset + limit if len(docs) > limit else None
+    # A page of daily series expands to tens of thousands of occurrences, so
+    # it is done off the event loop.
+    events = await asyncio.to_thread(expand_events, docs[:limit], window_start, window_end)
+    return events, next_offset
+
+def expand_events(docs: List[dict], window_start: datetime, window_end: datetime) -> List[dict]:
+    events = []
+    for doc in docs:
+        if doc.get("recurrence"):
+            events.extend(recurrence.iter_occurrences(doc, window_start, window_end))
+        else:
+            events.append({k: v for k, v in doc.items() if k not in recurrence.INTERNAL_FIELDS})
+    return events
+
+def event_times(event: dict) -> dict:
+    # Epoch copies of start/end; windows compare these, since ISO strings
+    # with different UTC offsets don't sort chronologically.
+    return {
+        "start_ts": recurrence.epoch(event.get("start_time")),
+        "end_ts": recurrence.epoch(event.get("end_time")),
+    }
+
+def with_series_bounds(event_dict: dict) -> dict:
+    if not event_dict.get("recurrence"):
+        event_dict["recurrence_start_ts"] = None
+        event_dict["recurrence_end_ts"] = None
+        return event_dict
+    try:
+        start_ts, end_ts = recurrence.series_bounds(event_dict)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    event_dict["recurrence_start_ts"] = start_ts
+    event_dict["recurrence_end_ts"] = end_ts
+    return event_dict
+
+async def find_event(event_id: str, query: Optional[dict] = None) -> Optional[dict]:
+    """Look up an event by id, including not-yet-stored occurrences of a series."""
+    query = query or {}
+    event = await db.events.find_one({"id": event_id, **query})
+    if event:
+        return event
+
+    parsed = recurrence.split_occurrence_id(event_id)
+    if parsed is None:
+        return None
+    series_id, start = parsed
+    if abs(start - datetime.now(timezone.utc)) > timedelta(days=RECURRENCE_HORIZON_DAYS):
+        return None
+    series = await db.events.find_one({"id": series_id, "recurrence": {"$ne": None}, **query}, {"_id": 0})
+    if series is None:
+        return None
+    return recurrence.occurrence_at(series, start)
+
+async def materialize_occurrence(event: dict) -> dict:
+    """Store a generated occurrence as its own document, detached from the series."""
+    if "_id" in event or not event.get("series_id"):
+        return event
+    await db.events.update_one(
+        {"id": event["id"]}, {"$setOnInsert": {**event, **event_times(event)}}, upsert=True
+    )
+    await db.events.update_one(
+        {"id": event["series_id"]},
+        {"$addToSet": {"exdates": recurrence.stamp(recurrence.parse_time(event["original_start"]))}}
+    )
+    return await db.events.find_one({"id": event["id"]})
+
+async def enforce_rate_limit(name: str, client_key: str) -> None:
+    retry_after = await rate_limiter.hit(f"{name}:{client_key}", RATE_LIMITS[name])
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+def limit_by_ip(name: str):
+    async def dependency(request: Request) -> None:
+        await enforce_rate_limit(name, request.client.host if request.client else "unknown")
+    return dependency
+
+def limit_by_user(name: str):
+    async def dependency(current_user: dict = Depends(get_current_user)) -> None:
+        await enforce_rate_limit(name, current_user["id"])
+    return dependency
+
+async def run_idempotent(idempotency_key: Optional[str], scope: str, payload: BaseModel, handler):
+    """Run ``handler`` once per Idempotency-Key; retries replay the stored response."""
+    if idempotency_key is None:
+        return await handler()
+    if not idempotency_key or len(idempotency_key) > idempotency.MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+
+    request_fingerprint = idempotency.fingerprint(payload.model_dump_json())
+    try:
+        token, stored = await idempotency_store.begin(scope, idempotency_key, request_fingerprint)
+    except idempotency.KeyInProgress:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    except idempotency.KeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different payload")
+    if stored:
+        status_code, body = stored
+        return Response(
+            content=body,
+            status_code=status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"}
+        )
+
+    # Renew the lease while the handler runs so a retry can't take it over
+    lease = asyncio.create_task(idempotency_store.keep_alive(scope, idempotency_key, token))
+    try:
+        result = await handler()
+    except BaseException:
+        await idempotency_store.abandon(scope, idempotency_key, token)
+        raise
+    finally:
+        lease.cancel()
+    completed = await idempotency_store.complete(
+        scope, idempotency_key, token, request_fingerprint, 200, jsonable_encoder(result)
+    )
+    if not completed:
+        logger.warning("Idempotency-Key %s was taken over before its response was stored", idempotency_key)
+    return result
+
 # Auth Routes
-@api_router.post("/auth/signup")
+@api_router.post("/auth/signup", dependencies=[Depends(limit_by_ip("signup"))])
 async def signup(user_data: UserSignup):
     # Check if user already exists
     existing_user = await db.users.find_one({"email": user_data.email})
@@ -159,7 +408,7 @@ async def signup(user_data: UserSignup):
         }
     }
 
-@api_router.post("/auth/login")
+@api_router.post("/auth/login", dependencies=[Depends(limit_by_ip("login"))])
 async def login(credentials: UserLogin):
     # Find user
     user = await db.users.find_one({"email": credentials.email})
@@ -194,20 +443,55 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 
 # Event Routes
 @api_router.get("/events", response_model=List[Event])
-async def get_events(current_user: dict = Depends(get_current_user)):
-    events = await db.events.find({"user_id": current_user["id"]}, {"_id": 0}).to_list(1000)
+async def get_events(
+    response: Response,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(EVENTS_PAGE_SIZE, ge=1, le=EVENTS_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """The user's events overlapping [start, end).
+
+    With neither ``start`` nor ``end``, single events are returned whatever
+    their time and recurring series are expanded over the next
+    RECURRENCE_DEFAULT_WINDOW_DAYS days. Pages hold up to ``limit`` stored
+    events (a series counts once); a ``Next-Offset`` header means there are
+    more.
+    """
+    window_start, window_end = recurrence_window(start, end)
+    events, next_offset = await find_events_in_window(
+        {"user_id": current_user["id"]}, window_start, window_end,
+        offset, limit, window_singles=bool(start or end)
+    )
+    if next_offset is not None:
+        response.headers["Next-Offset"] = str(next_offset)
     return events
 
 @api_router.post("/events", response_model=Event)
-async def create_event(event_data: EventCreate, current_user: dict = Depends(get_current_user)):
+async def create_event(
+    event_data: EventCreate,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
+):
+    return await run_idempotent(
+        idempotency_key,
+        f"{current_user['id']}:events",
+        event_data,
+        lambda: insert_event(event_data, current_user)
+    )
+
+async def insert_event(event_data: EventCreate, current_user: dict) -> Event:
     event = Event(
         user_id=current_user["id"],
         title=event_data.title,
         start_time=event_data.start_time,
         end_time=event_data.end_time,
-        status=event_data.status
+        status=event_data.status,
+        recurrence=event_data.recurrence
     )
-    event_dict = event.model_dump()
+    event_dict = with_series_bounds(event.model_dump())
+    event_dict.update(event_times(event_dict))
     await db.events.insert_one(event_dict)
     return event
 
@@ -218,58 +502,224 @@ async def update_event(
     current_user: dict = Depends(get_current_user)
 ):
     # Find event and verify ownership
-    event = await db.events.find_one({"id": event_id, "user_id": current_user["id"]})
+    event = await find_event(event_id, {"user_id": current_user["id"]})
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
     # Update fields
     update_data = {k: v for k, v in event_data.model_dump().items() if v is not None}
+    if update_data.get("recurrence") and event.get("series_id"):
+        raise HTTPException(status_code=400, detail="Cannot set recurrence on a single occurrence")
     if update_data:
+        # Editing an occurrence detaches it from its series
+        event = await materialize_occurrence(event)
+        if event.get("recurrence") or update_data.get("recurrence"):
+            merged = with_series_bounds({**event, **update_data})
+            update_data["recurrence_start_ts"] = merged["recurrence_start_ts"]
+            update_data["recurrence_end_ts"] = merged["recurrence_end_ts"]
+        if "start_time" in update_data or "end_time" in update_data:
+            update_data.update(event_times({**event, **update_data}))
         await db.events.update_one({"id": event_id}, {"$set": update_data})
     
     # Fetch updated event
-    updated_event = await db.events.find_one({"id": event_id}, {"_id": 0})
+    updated_event = await db.events.find_one({"id": event_id}, INTERNAL_PROJECTION)
     return updated_event
 
 @api_router.delete("/events/{event_id}")
 async def delete_event(event_id: str, current_user: dict = Depends(get_current_user)):
     result = await db.events.delete_one({"id": event_id, "user_id": current_user["id"]})
     if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Event not found")
+        # Deleting a generated occurrence only excludes it from its series
+        event = await find_event(event_id, {"user_id": current_user["id"]})
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+        await db.events.update_one(
+            {"id": event["series_id"]},
+            {"$addToSet": {"exdates": recurrence.stamp(recurrence.parse_time(event["original_start"]))}}
+        )
     return {"message": "Event deleted successfully"}
 
+# Dashboard
+@api_router.get("/dashboard")
+async def get_dashboard(
+    upcoming: int = Query(5, ge=1, le=50),
+    current_user: dict = Depends(get_current_user)
+):
+    # Counts: the user's events and pending swap requests are combined with
+    # $unionWith and summarised by a single $facet stage. Only the fields the
+    # counts need flow through it, but it still visits each of the user's
+    # events. Upcoming events are a separate query so the sort and limit run
+    # on the (user_id, start_ts) index; stages inside $facet can't use one.
+    user_id = current_user["id"]
+    now = datetime.now(timezone.utc)
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$project": {"_id": 0, "status": 1, "recurrence": 1}},
+        {"$set": {"kind": "event"}},
+        {"$unionWith": {
+            "coll": "swap_requests",
+            "pipeline": [
+                {"$match": {
+                    "status": "PENDING",
+                    "$or": [{"target_user_id": user_id}, {"requester_id": user_id}],
+                }},
+                {"$project": {"_id": 0, "target_user_id": 1, "requester_id": 1}},
+                {"$set": {"kind": "swap"}},
+            ],
+        }},
+        {"$facet": {
+            "status_counts": [
+                {"$match": {"kind": "event", "recurrence": None}},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+            ],
+            "recurring_series": [
+                {"$match": {"kind": "event", "recurrence": {"$ne": None}}},
+                {"$count": "count"},
+            ],
+            "incoming_pending": [
+                {"$match": {"kind": "swap", "target_user_id": user_id}},
+                {"$count": "count"},
+            ],
+            "outgoing_pending": [
+                {"$match": {"kind": "swap", "requester_id": user_id}},
+                {"$count": "count"},
+            ],
+        }},
+    ]
+    # Recurring series contribute their next occurrences, expanded lazily
+    window_end = now + timedelta(days=RECURRENCE_DEFAULT_WINDOW_DAYS)
+    facets, next_events, series = await asyncio.gather(
+        db.events.aggregate(pipeline).to_list(1),
+        db.events.find(
+            {"user_id": user_id, "recurrence": None, "start_ts": {"$gte": now.timestamp()}},
+            INTERNAL_PROJECTION
+        ).sort("start_ts", 1).limit(upcoming).to_list(upcoming),
+        db.events.find(
+            {"user_id": user_id, **series_overlapping(now, window_end)}, {"_id": 0}
+        ).to_list(None),
+    )
+    occurrences = await asyncio.to_thread(dashboard.next_occurrences, series, now, window_end, upcoming)
+    return dashboard.summarize(facets[0], next_events + occurrences, now, upcoming)
+
 # Swap Routes
-@api_router.get("/swappable-slots")
-async def get_swappable_slots(current_user: dict = Depends(get_current_user)):
-    # Get all swappable slots from other users
-    slots = await db.events.find({
+@api_router.get("/swappable-slots", dependencies=[Depends(limit_by_user("swappable_slots"))])
+async def get_swappable_slots(
+    response: Response,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(EVENTS_PAGE_SIZE, ge=1, le=EVENTS_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """Other users' swappable slots; ``start``/``end`` and paging as for GET /events."""
+    window_start, window_end = recurrence_window(start, end)
+    slots, next_offset = await find_events_in_window({
         "status": "SWAPPABLE",
         "user_id": {"$ne": current_user["id"]}
-    }, {"_id": 0}).to_list(1000)
+    }, window_start, window_end, offset, limit, window_singles=bool(start or end))
+    if next_offset is not None:
+        response.headers["Next-Offset"] = str(next_offset)
     
     # Enrich with user information
+    users = {}
     for slot in slots:
-        user = await db.users.find_one({"id": slot["user_id"]}, {"_id": 0, "password_hash": 0})
+        if slot["user_id"] not in users:
+            users[slot["user_id"]] = await db.users.find_one(
+                {"id": slot["user_id"]}, {"_id": 0, "password_hash": 0}
+            )
+        user = users[slot["user_id"]]
         if user:
             slot["user_name"] = user["name"]
             slot["user_email"] = user["email"]
     
     return slots
 
+@api_router.get("/swappable-slots/search", dependencies=[Depends(limit_by_user("search"))])
+async def search_swappable_slots(
+    q: Optional[str] = None,
+    day: Optional[str] = None,
+    hour: Optional[int] = Query(None, ge=0, le=23),
+    owner_timezone: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """Search other users' swappable slots by title or owner name.
+
+    ``day`` and ``hour`` refer to the slot start in the searcher's timezone;
+    ``day`` is a weekday name or its abbreviation and ``hour`` selects the
+    search.HOUR_BUCKET-hour bucket containing it.
+
+    Only single slots are searched. Occurrences of recurring series are not,
+    unless they have been stored on their own (edited or swapped); browse
+    them through GET /swappable-slots.
+    """
+    try:
+        day_number = search.parse_day(day) if day is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        tz = ZoneInfo(current_user.get("timezone") or "UTC").key
+    except (ZoneInfoNotFoundError, ValueError):
+        tz = "UTC"
+
+    owner_ids = None
+    if q:
+        owners = await db.users.find(
+            {"$text": {"$search": q}}, {"_id": 0, "id": 1}
+        ).limit(search.MAX_OWNERS + 1).to_list(search.MAX_OWNERS + 1)
+        if len(owners) > search.MAX_OWNERS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Search matches more than {search.MAX_OWNERS} owners; use a more specific query"
+            )
+        owner_ids = [owner["id"] for owner in owners]
+    match = search.build_match(current_user["id"], q, owner_ids)
+
+    results, facets = await asyncio.gather(
+        db.events.aggregate(search.results_pipeline(
+            match, tz, offset, limit, day_number, hour, owner_timezone, text_search=bool(q)
+        ), allowDiskUse=True).to_list(limit),
+        db.events.aggregate(
+            search.facets_pipeline(match, tz, day_number, hour, owner_timezone), allowDiskUse=True
+        ).to_list(1),
+    )
+    summary = search.format_facets(facets[0])
+    return {
+        "total": summary["total"],
+        "offset": offset,
+        "limit": limit,
+        "results": results,
+        "facets": summary["facets"],
+    }
+
 @api_router.post("/swap-request")
 async def create_swap_request(
     swap_data: SwapRequestCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
 ):
+    return await run_idempotent(
+        idempotency_key,
+        f"{current_user['id']}:swap-request",
+        swap_data,
+        lambda: insert_swap_request(swap_data, current_user)
+    )
+
+async def insert_swap_request(swap_data: SwapRequestCreate, current_user: dict) -> SwapRequest:
     # Verify both slots exist
-    my_slot = await db.events.find_one({"id": swap_data.my_slot_id, "user_id": current_user["id"]})
+    my_slot = await find_event(swap_data.my_slot_id, {"user_id": current_user["id"]})
     if not my_slot:
         raise HTTPException(status_code=404, detail="Your slot not found")
     
-    their_slot = await db.events.find_one({"id": swap_data.their_slot_id})
+    their_slot = await find_event(swap_data.their_slot_id)
     if not their_slot:
         raise HTTPException(status_code=404, detail="Target slot not found")
     
+    # Only single occurrences can change hands, never a whole series
+    if my_slot.get("recurrence") or their_slot.get("recurrence"):
+        raise HTTPException(status_code=400, detail="Select a single occurrence of a recurring slot")
+    
     # Verify both slots are SWAPPABLE
     if my_slot["status"] != "SWAPPABLE":
         raise HTTPException(status_code=400, detail="Your slot is not swappable")
@@ -277,6 +727,9 @@ async def create_swap_request(
     if their_slot["status"] != "SWAPPABLE":
         raise HTTPException(status_code=400, detail="Target slot is not swappable")
     
+    my_slot = await materialize_occurrence(my_slot)
+    their_slot = await materialize_occurrence(their_slot)
+    
     # Create swap request
     swap_request = SwapRequest(
         requester_id=current_user["id"],
@@ -356,7 +809,7 @@ async def respond_to_swap(
         
         return {"message": "Swap rejected", "status": "REJECTED"}
 
-@api_router.get("/swap-requests/incoming")
+@api_router.get("/swap-requests/incoming", dependencies=[Depends(limit_by_user("swap_requests"))])
 async def get_incoming_swap_requests(current_user: dict = Depends(get_current_user)):
     requests = await db.swap_requests.find({
         "target_user_id": current_user["id"],
@@ -379,7 +832,7 @@ async def get_incoming_swap_requests(current_user: dict = Depends(get_current_us
     
     return requests
 
-@api_router.get("/swap-requests/outgoing")
+@api_router.get("/swap-requests/outgoing", dependencies=[Depends(limit_by_user("swap_requests"))])
 async def get_outgoing_swap_requests(current_user: dict = Depends(get_current_user)):
     requests = await db.swap_requests.find({
         "requester_id": current_user["id"]
@@ -401,23 +854,85 @@ async def get_outgoing_swap_requests(current_user: dict = Depends(get_current_us
     
     return requests
 
-# Include router
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Startup / shutdown
+async def ensure_indexes(database) -> None:
+    # Every route filters on these fields; without indexes each lookup is a
+    # collection scan.
+    await database.users.create_index("id")
+    await database.users.create_index("email")
+    await database.users.create_index([("name", "text")])
+    await database.users.create_index([("id", 1), ("timezone", 1)])
+    await database.events.create_index("id")
+    await database.events.create_index([("status", 1), ("user_id", 1)])
+    await database.events.create_index([("recurrence", 1), ("recurrence_start_ts", 1)])
+    await database.events.create_index([("user_id", 1), ("start_ts", 1)])
+    await database.events.create_index([("status", 1), ("start_ts", 1)])
+    await database.events.create_index([("title", "text")])
+    await database.swap_requests.create_index("id")
+    await database.swap_requests.create_index([("target_user_id", 1), ("status", 1)])
+    await database.swap_requests.create_index("requester_id")
+
+async def backfill_event_times(database) -> None:
+    # Events stored before start_ts/end_ts existed get them once; every write
+    # since sets them. Workers racing here write the same values.
+    batch = []
+    async for event in database.events.find(
+        {"start_ts": {"$exists": False}}, {"_id": 1, "start_time": 1, "end_time": 1}
+    ):
+        batch.append(UpdateOne({"_id": event["_id"]}, {"$set": event_times(event)}))
+        if len(batch) == 1000:
+            await database.events.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await database.events.bulk_write(batch, ordered=False)
+
+async def warm_up() -> None:
+    # Load the bcrypt backend up front so the first login doesn't pay for it
+    await asyncio.to_thread(pwd_context.hash, "warm-up")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db, rate_limiter, idempotency_store
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    # Everything after the client exists is inside the try, so a failed index
+    # build or warm-up still closes it.
+    try:
+        db = client[os.environ['DB_NAME']]
+        await ensure_indexes(db)
+        await backfill_event_times(db)
+        if RATE_LIMIT_BACKEND == 'mongo':
+            rate_limiter = MongoBackend(db.rate_limits)
+            await rate_limiter.ensure_indexes()
+        else:
+            rate_limiter = MemoryBackend()
+        idempotency_store = idempotency.IdempotencyStore(
+            db.idempotency_keys,
+            ttl_seconds=IDEMPOTENCY_TTL_HOURS * 3600,
+            lease_seconds=IDEMPOTENCY_LEASE_SECONDS
+        )
+        await idempotency_store.ensure_indexes()
+        await warm_up()
+        logger.info("Worker %s ready", os.getpid())
+        yield
+    finally:
+        # Uvicorn only runs lifespan shutdown once in-flight requests have
+        # drained, so closing the client here is safe.
+        client.close()
+        client = None
+        db = None
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(api_router)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Next-Offset"],
+    )
+    return app
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+app = create_app()
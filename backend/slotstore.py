@@ -0,0 +1,218 @@
+"""Compact columnar storage for large sets of slots.
+
+Event documents are dicts of strings: a UUID, two ISO timestamps, a status
+and a user id per slot, which adds up to well over a kilobyte each. For
+server-side caches and scoring over a whole marketplace, ``SlotStore``
+keeps the same data as parallel numpy columns instead:
+
+* ``ids``     16-byte binary UUIDs (uint8[n, 16])
+* ``start`` / ``end``  epoch seconds (int64)
+* ``user``    index into ``users`` (int32), each user id stored once
+* ``status``  index into ``STATUSES`` (uint8)
+
+Titles are interned, so repeated titles cost one string. Filters return
+row indices and the column properties are views, so nothing is copied until
+rows are turned back into dicts with ``rows()``.
+
+This is a library module; no route uses it yet.
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+import recurrence
+
+STATUSES = ("BUSY", "SWAPPABLE", "SWAP_PENDING")
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+
+class SlotStore:
+    def __init__(self, capacity: int = 1024):
+        self._n = 0
+        self._ids = np.zeros((capacity, 16), dtype=np.uint8)
+        self._start = np.zeros(capacity, dtype=np.int64)
+        self._end = np.zeros(capacity, dtype=np.int64)
+        self._user = np.zeros(capacity, dtype=np.int32)
+        self._status = np.zeros(capacity, dtype=np.uint8)
+        self._titles: List[str] = []
+        self._interned: Dict[str, str] = {}
+        self.users: List[str] = []
+        self._user_index: Dict[str, int] = {}
+        self._rows: Dict[bytes, int] = {}
+        # Ids that are not plain UUIDs (e.g. recurring occurrences), by row
+        self._odd_ids: Dict[int, str] = {}
+
+    @classmethod
+    def from_events(cls, events: Iterable[dict]) -> "SlotStore":
+        store = cls()
+        for event in events:
+            store.add(event)
+        return store
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __contains__(self, event_id: str) -> bool:
+        return self._key(event_id) in self._rows
+
+    # Column views (no copies)
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[:self._n]
+
+    @property
+    def start(self) -> np.ndarray:
+        return self._start[:self._n]
+
+    @property
+    def end(self) -> np.ndarray:
+        return self._end[:self._n]
+
+    @property
+    def user(self) -> np.ndarray:
+        return self._user[:self._n]
+
+    @property
+    def status(self) -> np.ndarray:
+        return self._status[:self._n]
+
+    def user_code(self, user_id: str) -> Optional[int]:
+        return self._user_index.get(user_id)
+
+    def add(self, event: dict) -> int:
+        """Insert or replace ``event``; returns its row."""
+        key = self._key(event["id"])
+        row = self._rows.get(key)
+        if row is None:
+            if self._n == len(self._start):
+                self._grow()
+            row = self._n
+            self._n += 1
+            self._titles.append("")
+            self._rows[key] = row
+
+        self._ids[row] = np.frombuffer(key, dtype=np.uint8)
+        self._start[row] = int(recurrence.parse_time(event["start_time"]).timestamp())
+        self._end[row] = int(recurrence.parse_time(event["end_time"]).timestamp())
+        self._user[row] = self._intern_user(event["user_id"])
+        self._status[row] = STATUS_CODES[event["status"]]
+        self._titles[row] = self._interned.setdefault(event["title"], event["title"])
+        if key != self._uuid_bytes(event["id"]):
+            self._odd_ids[row] = event["id"]
+        else:
+            self._odd_ids.pop(row, None)
+        return row
+
+    def set_status(self, event_id: str, status: str) -> None:
+        self._status[self._rows[self._key(event_id)]] = STATUS_CODES[status]
+
+    def remove(self, event_id: str) -> None:
+        # Move the last row into the hole so columns stay dense
+        row = self._rows.pop(self._key(event_id))
+        last = self._n - 1
+        if row != last:
+            for column in (self._ids, self._start, self._end, self._user, self._status):
+                column[row] = column[last]
+            self._titles[row] = self._titles[last]
+            self._rows[self._ids[row].tobytes()] = row
+            if last in self._odd_ids:
+                self._odd_ids[row] = self._odd_ids.pop(last)
+            else:
+                self._odd_ids.pop(row, None)
+        else:
+            self._odd_ids.pop(row, None)
+        self._titles.pop()
+        self._n = last
+
+    def select(
+        self,
+        status: Optional[str] = None,
+        user_id: Optional[str] = None,
+        exclude_user_id: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> np.ndarray:
+        """Rows matching every given filter; ``start``/``end`` select overlapping slots."""
+        mask = np.ones(self._n, dtype=bool)
+        if status is not None:
+            mask &= self.status == STATUS_CODES[status]
+        if user_id is not None:
+            code = self._user_index.get(user_id)
+            if code is None:
+                return np.empty(0, dtype=np.intp)
+            mask &= self.user == code
+        if exclude_user_id is not None:
+            code = self._user_index.get(exclude_user_id)
+            if code is not None:
+                mask &= self.user != code
+        if start is not None:
+            mask &= self.end > start
+        if end is not None:
+            mask &= self.start < end
+        return np.flatnonzero(mask)
+
+    def rows(self, indices: Optional[Iterable[int]] = None) -> Iterator[dict]:
+        """Rebuild event dicts (id, user_id, title, times, status) for ``indices``."""
+        if indices is None:
+            indices = range(self._n)
+        for row in indices:
+            row = int(row)
+            yield {
+                "id": self.event_id(row),
+                "user_id": self.users[self._user[row]],
+                "title": self._titles[row],
+                "start_time": recurrence.format_time(_from_epoch(self._start[row])),
+                "end_time": recurrence.format_time(_from_epoch(self._end[row])),
+                "status": STATUSES[self._status[row]],
+            }
+
+    def event_id(self, row: int) -> str:
+        odd = self._odd_ids.get(row)
+        if odd is not None:
+            return odd
+        return str(uuid.UUID(bytes=self._ids[row].tobytes()))
+
+    def nbytes(self) -> int:
+        """Bytes held by the numpy columns (excludes titles and lookup dicts)."""
+        return sum(
+            column[:self._n].nbytes
+            for column in (self._ids, self._start, self._end, self._user, self._status)
+        )
+
+    def _grow(self) -> None:
+        capacity = len(self._start) * 2
+        for name in ("_ids", "_start", "_end", "_user", "_status"):
+            column = getattr(self, name)
+            grown = np.zeros((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _intern_user(self, user_id: str) -> int:
+        code = self._user_index.get(user_id)
+        if code is None:
+            code = len(self.users)
+            self.users.append(user_id)
+            self._user_index[user_id] = code
+        return code
+
+    @staticmethod
+    def _uuid_bytes(event_id: str) -> Optional[bytes]:
+        try:
+            return uuid.UUID(event_id).bytes
+        except ValueError:
+            return None
+
+    @classmethod
+    def _key(cls, event_id: str) -> bytes:
+        # Non-UUID ids are hashed down to 16 bytes; the original string is
+        # kept in _odd_ids so it round-trips.
+        key = cls._uuid_bytes(event_id)
+        if key is None:
+            key = uuid.uuid5(uuid.NAMESPACE_URL, event_id).bytes
+        return key
+
+
+def _from_epoch(seconds) -> datetime:
+    return datetime.fromtimestamp(int(seconds), tz=timezone.utc)
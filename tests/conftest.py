@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The backend is run from its own directory (``uvicorn server:app``), so its
+# modules import each other as top-level names.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
@@ -0,0 +1,81 @@
+from dashboard import facet_count, next_occurrences, status_counts, summarize, upcoming
+from recurrence import parse_time
+
+NOW = parse_time("2030-01-07T12:00:00Z")
+
+
+def make_event(event_id, start_time):
+    return {"id": event_id, "title": "Shift", "start_time": start_time, "end_time": start_time}
+
+
+def make_series(rule="FREQ=DAILY", start="2030-01-01T09:00:00Z"):
+    return {
+        "id": "series-1",
+        "user_id": "user-1",
+        "title": "Shift",
+        "start_time": start,
+        "end_time": "2030-01-01T17:00:00Z",
+        "status": "BUSY",
+        "recurrence": rule,
+        "exdates": [],
+    }
+
+
+def test_facet_count_treats_missing_count_as_zero():
+    facets = {"incoming_pending": [{"count": 3}], "outgoing_pending": []}
+    assert facet_count(facets, "incoming_pending") == 3
+    assert facet_count(facets, "outgoing_pending") == 0
+    assert facet_count(facets, "recurring_series") == 0
+
+
+def test_status_counts_default_every_status_to_zero():
+    facets = {"status_counts": [{"_id": "SWAPPABLE", "count": 2}]}
+    assert status_counts(facets) == {"BUSY": 0, "SWAPPABLE": 2, "SWAP_PENDING": 0}
+
+
+def test_upcoming_merges_sorts_and_truncates_by_instant():
+    events = [
+        make_event("c", "2030-01-09T09:00:00Z"),
+        # 08:00 at +05:00 is 03:00 UTC, before "b" although it sorts after it as a string
+        make_event("a", "2030-01-08T08:00:00+05:00"),
+        make_event("b", "2030-01-08T07:00:00Z"),
+        make_event("d", "2030-01-10T09:00:00Z"),
+    ]
+    assert [e["id"] for e in upcoming(events, NOW, 3)] == ["a", "b", "c"]
+
+
+def test_upcoming_skips_past_and_unparsable_events():
+    events = [
+        make_event("past", "2030-01-07T11:59:00Z"),
+        make_event("bad", "tomorrow 9am"),
+        {"id": "missing", "title": "No times"},
+        make_event("next", "2030-01-07T12:00:00Z"),
+    ]
+    assert [e["id"] for e in upcoming(events, NOW, 5)] == ["next"]
+
+
+def test_next_occurrences_limits_each_series():
+    occurrences = next_occurrences([make_series()], NOW, parse_time("2030-02-01T00:00:00Z"), 2)
+    # Today's 09:00-17:00 occurrence overlaps now but has already started
+    assert [o["start_time"] for o in occurrences] == [
+        "2030-01-07T09:00:00+00:00",
+        "2030-01-08T09:00:00+00:00",
+    ]
+    assert [e["id"] for e in upcoming(occurrences, NOW, 2)] == ["series-1@20300108T090000Z"]
+
+
+def test_summarize():
+    facets = {
+        "status_counts": [{"_id": "BUSY", "count": 4}, {"_id": "SWAP_PENDING", "count": 1}],
+        "recurring_series": [{"count": 1}],
+        "incoming_pending": [{"count": 1}],
+        "outgoing_pending": [],
+    }
+    series = next_occurrences([make_series()], NOW, parse_time("2030-02-01T00:00:00Z"), 2)
+    single = make_event("single", "2030-01-08T08:00:00Z")
+
+    summary = summarize(facets, [single] + series, NOW, 2)
+    assert summary["status_counts"] == {"BUSY": 4, "SWAPPABLE": 0, "SWAP_PENDING": 1}
+    assert summary["recurring_series"] == 1
+    assert summary["pending_swaps"] == {"incoming": 1, "outgoing": 0}
+    assert [e["id"] for e in summary["upcoming"]] == ["single", "series-1@20300108T090000Z"]
@@ -0,0 +1,168 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from idempotency import IdempotencyStore, KeyInProgress, KeyReused, fingerprint
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for IdempotencyStore, keyed by ``id``."""
+
+    def __init__(self):
+        self.docs = {}
+        self.finds = 0
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+    async def insert_one(self, doc):
+        if doc["id"] in self.docs:
+            raise DuplicateKeyError("duplicate id")
+        self.docs[doc["id"]] = dict(doc)
+
+    async def find_one(self, query, projection=None):
+        self.finds += 1
+        doc = self.docs.get(query["id"])
+        return dict(doc) if doc and self._matches(doc, query) else None
+
+    async def update_one(self, query, update):
+        doc = self.docs.get(query["id"])
+        if doc is None or not self._matches(doc, query):
+            return SimpleNamespace(modified_count=0)
+        doc.update(update["$set"])
+        return SimpleNamespace(modified_count=1)
+
+    async def delete_one(self, query):
+        doc = self.docs.get(query["id"])
+        if doc is None or not self._matches(doc, query):
+            return SimpleNamespace(deleted_count=0)
+        del self.docs[query["id"]]
+        return SimpleNamespace(deleted_count=1)
+
+    @staticmethod
+    def _matches(doc, query):
+        for field, expected in query.items():
+            if isinstance(expected, dict):
+                if not doc.get(field) <= expected["$lte"]:
+                    return False
+            elif doc.get(field) != expected:
+                return False
+        return True
+
+
+@pytest.fixture
+def collection():
+    return FakeCollection()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+FP = fingerprint('{"title":"Shift"}')
+
+
+def test_first_request_reserves_then_retry_replays(collection):
+    store = IdempotencyStore(collection)
+    token, stored = run(store.begin("user-1:events", "k1", FP))
+    assert token and stored is None
+    assert run(store.complete("user-1:events", "k1", token, FP, 200, {"id": "e1", "title": "Shift"}))
+
+    assert run(store.begin("user-1:events", "k1", FP)) == (None, (200, '{"id":"e1","title":"Shift"}'))
+
+
+def test_replay_from_mongo_when_front_cache_is_cold(collection):
+    token, _ = run(IdempotencyStore(collection).begin("s", "k", FP))
+    run(IdempotencyStore(collection).complete("s", "k", token, FP, 200, {"ok": True}))
+
+    other_worker = IdempotencyStore(collection)
+    assert run(other_worker.begin("s", "k", FP)) == (None, (200, '{"ok":true}'))
+    finds = collection.finds
+    assert run(other_worker.begin("s", "k", FP)) == (None, (200, '{"ok":true}'))
+    assert collection.finds == finds  # served from the front cache
+
+
+def test_reused_key_with_different_payload(collection):
+    store = IdempotencyStore(collection)
+    token, _ = run(store.begin("s", "k", FP))
+    run(store.complete("s", "k", token, FP, 200, {}))
+    with pytest.raises(KeyReused):
+        run(store.begin("s", "k", fingerprint("other")))
+
+
+def test_key_in_flight(collection):
+    store = IdempotencyStore(collection)
+    run(store.begin("s", "k", FP))
+    with pytest.raises(KeyInProgress):
+        run(IdempotencyStore(collection).begin("s", "k", FP))
+
+
+def test_stale_reservation_is_taken_over(collection):
+    store = IdempotencyStore(collection, lease_seconds=0)
+    first, _ = run(store.begin("s", "k", FP))  # holder dies without completing
+    second, _ = run(IdempotencyStore(collection).begin("s", "k", FP))
+    assert second and second != first
+    # The new holder's lease is live again
+    with pytest.raises(KeyInProgress):
+        run(IdempotencyStore(collection).begin("s", "k", FP))
+
+
+def test_late_complete_after_takeover_is_discarded(collection):
+    slow = IdempotencyStore(collection, lease_seconds=0)
+    first, _ = run(slow.begin("s", "k", FP))
+    retry = IdempotencyStore(collection)
+    second, _ = run(retry.begin("s", "k", FP))
+
+    assert not run(slow.complete("s", "k", first, FP, 200, {"from": "first"}))
+    assert run(retry.complete("s", "k", second, FP, 200, {"from": "retry"}))
+    assert run(IdempotencyStore(collection).begin("s", "k", FP)) == (None, (200, '{"from":"retry"}'))
+
+
+def test_late_abandon_after_takeover_keeps_new_reservation(collection):
+    slow = IdempotencyStore(collection, lease_seconds=0)
+    first, _ = run(slow.begin("s", "k", FP))
+    second, _ = run(IdempotencyStore(collection).begin("s", "k", FP))
+
+    run(slow.abandon("s", "k", first))
+    assert collection.docs["s:k"]["token"] == second
+    with pytest.raises(KeyInProgress):
+        run(IdempotencyStore(collection).begin("s", "k", FP))
+
+
+def test_renew_keeps_lease_until_key_is_lost(collection):
+    store = IdempotencyStore(collection, lease_seconds=0)
+    first, _ = run(store.begin("s", "k", FP))
+    assert run(store.renew("s", "k", first))
+    second, _ = run(IdempotencyStore(collection).begin("s", "k", FP))
+    assert not run(store.renew("s", "k", first))
+    assert run(store.renew("s", "k", second))
+
+
+def test_keep_alive_stops_once_key_is_lost(collection):
+    store = IdempotencyStore(collection, lease_seconds=0)
+    first, _ = run(store.begin("s", "k", FP))
+    run(IdempotencyStore(collection).begin("s", "k", FP))
+    run(asyncio.wait_for(store.keep_alive("s", "k", first), timeout=1))
+
+
+def test_abandon_releases_key(collection):
+    store = IdempotencyStore(collection)
+    token, _ = run(store.begin("s", "k", FP))
+    run(store.abandon("s", "k", token))
+    assert run(store.begin("s", "k", FP))[0] is not None
+
+
+def test_keys_are_scoped(collection):
+    store = IdempotencyStore(collection)
+    run(store.begin("user-1:events", "k", FP))
+    assert run(store.begin("user-2:events", "k", FP))[0] is not None
+
+
+def test_front_cache_is_bounded(collection):
+    store = IdempotencyStore(collection, front_size=2)
+    for key in ("a", "b", "c"):
+        token, _ = run(store.begin("s", key, FP))
+        run(store.complete("s", key, token, FP, 200, {}))
+    assert list(store._front) == ["s:b", "s:c"]
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from ratelimit import MemoryBackend, MongoBackend, RateLimit
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse():
+    limit = RateLimit.parse("10/60")
+    assert (limit.burst, limit.period) == (10, 60.0)
+    assert limit.rate == pytest.approx(10 / 60)
+
+
+@pytest.mark.parametrize("value", ["0/60", "5/0", "5/-1", "5/inf", "ten/60", "5/soon", ""])
+def test_parse_rejects_invalid_limits(value):
+    with pytest.raises(ValueError, match="Invalid rate limit"):
+        RateLimit.parse(value)
+
+
+def test_burst_then_reject_with_retry_after():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+    limit = RateLimit(burst=3, period=30)  # one token every 10 s
+
+    assert [backend.take("login:1.2.3.4", limit) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert backend.take("login:1.2.3.4", limit) == pytest.approx(10.0)
+
+
+def test_refill_over_time_is_capped_at_burst():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+    limit = RateLimit(burst=2, period=20)
+    backend.take("k", limit)
+    backend.take("k", limit)
+    assert backend.take("k", limit) > 0
+
+    clock.now += 10
+    assert backend.take("k", limit) == 0.0
+    assert backend.take("k", limit) > 0
+
+    clock.now += 1000
+    assert [backend.take("k", limit) for _ in range(2)] == [0.0, 0.0]
+    assert backend.take("k", limit) > 0
+
+
+def test_keys_are_independent():
+    backend = MemoryBackend(clock=FakeClock())
+    limit = RateLimit(burst=1, period=60)
+    assert backend.take("login:a", limit) == 0.0
+    assert backend.take("login:a", limit) > 0
+    assert backend.take("login:b", limit) == 0.0
+
+
+def test_evicts_least_recently_used_key_at_capacity():
+    backend = MemoryBackend(clock=FakeClock(), max_keys=2)
+    limit = RateLimit(burst=1, period=60)
+    backend.take("a", limit)
+    backend.take("b", limit)
+    backend.take("a", limit)  # "a" is now the most recently used
+    backend.take("c", limit)  # evicts "b"
+
+    assert len(backend._buckets) == 2
+    assert backend.take("a", limit) > 0
+    assert backend.take("b", limit) == 0.0  # fresh bucket after eviction
+
+
+def test_flood_of_new_keys_stays_bounded():
+    backend = MemoryBackend(clock=FakeClock(), max_keys=100)
+    limit = RateLimit(burst=5, period=60)
+    for i in range(10_000):
+        assert backend.take(f"signup:{i}", limit) == 0.0
+    assert len(backend._buckets) == 100
+
+
+def test_hit_is_async_take():
+    backend = MemoryBackend(clock=FakeClock())
+    limit = RateLimit(burst=1, period=60)
+    assert asyncio.run(backend.hit("k", limit)) == 0.0
+    assert asyncio.run(backend.hit("k", limit)) > 0
+
+
+class FakeBucketCollection:
+    """Just enough of a Motor collection for MongoBackend: evaluates its update pipeline."""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one_and_update(self, query, pipeline, upsert, return_document, projection):
+        doc = self.docs.setdefault(query["key"], dict(query))
+        for stage in pipeline:
+            doc.update({field: self._eval(expr, doc) for field, expr in stage["$set"].items()})
+        return {field: doc[field] for field in ("tokens", "allowed")}
+
+    def _eval(self, expr, doc):
+        if isinstance(expr, str) and expr.startswith("$"):
+            return doc.get(expr[1:])
+        if not isinstance(expr, dict):
+            return expr
+        (op, args), = expr.items()
+        args = [self._eval(arg, doc) for arg in args]
+        if op == "$ifNull":
+            return args[0] if args[0] is not None else args[1]
+        if op == "$cond":
+            return args[1] if args[0] else args[2]
+        return {
+            "$min": min,
+            "$add": lambda a, b: a + b,
+            "$subtract": lambda a, b: a - b,
+            "$multiply": lambda a, b: a * b,
+            "$gte": lambda a, b: a >= b,
+        }[op](*args)
+
+
+def test_mongo_backend_burst_refill_and_retry_after():
+    clock = FakeClock()
+    backend = MongoBackend(FakeBucketCollection(), clock=clock)
+    limit = RateLimit(burst=3, period=30)  # one token every 10 s
+
+    hits = [asyncio.run(backend.hit("login:1.2.3.4", limit)) for _ in range(4)]
+    assert hits[:3] == [0.0, 0.0, 0.0]
+    assert hits[3] == pytest.approx(10.0)
+
+    clock.now += 4
+    assert asyncio.run(backend.hit("login:1.2.3.4", limit)) == pytest.approx(6.0)
+    clock.now += 6
+    assert asyncio.run(backend.hit("login:1.2.3.4", limit)) == 0.0
+    assert asyncio.run(backend.hit("login:5.6.7.8", limit)) == 0.0
+
+
+def test_mongo_backend_refill_is_capped_at_burst():
+    clock = FakeClock()
+    backend = MongoBackend(FakeBucketCollection(), clock=clock)
+    limit = RateLimit(burst=2, period=20)
+    asyncio.run(backend.hit("k", limit))
+    clock.now += 1000
+    assert [asyncio.run(backend.hit("k", limit)) for _ in range(2)] == [0.0, 0.0]
+    assert asyncio.run(backend.hit("k", limit)) > 0
@@ -0,0 +1,182 @@
+import time
+from datetime import timedelta
+
+import pytest
+
+import recurrence
+from recurrence import (
+    MAX_COUNT,
+    build_rule,
+    fast_forward,
+    iter_occurrences,
+    occurrence_at,
+    occurrence_id,
+    parse_rule,
+    parse_time,
+    series_bounds,
+    split_occurrence_id,
+)
+
+
+def make_series(rule, start="2030-01-07T09:00:00Z", end="2030-01-07T17:00:00Z", **extra):
+    return {
+        "id": "series-1",
+        "user_id": "user-1",
+        "title": "Shift",
+        "start_time": start,
+        "end_time": end,
+        "status": "SWAPPABLE",
+        "recurrence": rule,
+        "exdates": [],
+        **extra,
+    }
+
+
+@pytest.mark.parametrize("rule", [
+    "FREQ=DAILY;INTERVAL=0",
+    "FREQ=DAILY;INTERVAL=-1",
+    "FREQ=DAILY;INTERVAL=1000",
+    "FREQ=DAILY;BYMONTH=2;BYMONTHDAY=30",
+    "FREQ=DAILY;BYDAY=MO;INTERVAL=7",
+    "FREQ=MONTHLY;BYDAY=5FR",
+    "FREQ=HOURLY",
+    "FREQ=WEEKLY;COUNT=0",
+    f"FREQ=WEEKLY;COUNT={MAX_COUNT + 1}",
+    "FREQ=WEEKLY;COUNT=many",
+    "INTERVAL=2",
+])
+def test_build_rule_rejects_unsafe_rules(rule):
+    with pytest.raises(ValueError):
+        build_rule(rule, parse_time("2030-01-07T09:00:00Z"))
+
+
+def test_build_rule_accepts_rrule_prefix_and_trailing_separator():
+    rule = build_rule("RRULE:freq=weekly;byday=MO,WE;", parse_time("2030-01-07T09:00:00Z"))
+    starts = list(rule.xafter(parse_time("2030-01-07T00:00:00Z"), count=3))
+    assert [s.day for s in starts] == [7, 9, 14]
+
+
+def test_iter_occurrences_only_yields_window():
+    series = make_series("FREQ=WEEKLY")
+    occurrences = list(iter_occurrences(
+        series, parse_time("2030-02-01T00:00:00Z"), parse_time("2030-03-01T00:00:00Z")
+    ))
+    assert [o["start_time"] for o in occurrences] == [
+        "2030-02-04T09:00:00+00:00",
+        "2030-02-11T09:00:00+00:00",
+        "2030-02-18T09:00:00+00:00",
+        "2030-02-25T09:00:00+00:00",
+    ]
+    assert all(o["series_id"] == "series-1" and o["recurrence"] is None for o in occurrences)
+
+
+def test_iter_occurrences_includes_occurrence_overlapping_window_start():
+    series = make_series("FREQ=WEEKLY")
+    occurrences = list(iter_occurrences(
+        series, parse_time("2030-01-14T12:00:00Z"), parse_time("2030-01-15T00:00:00Z")
+    ))
+    assert [o["id"] for o in occurrences] == ["series-1@20300114T090000Z"]
+
+
+def test_iter_occurrences_skips_exdates_and_respects_count():
+    series = make_series("FREQ=DAILY;COUNT=3", exdates=["20300108T090000Z"])
+    occurrences = list(iter_occurrences(
+        series, parse_time("2030-01-01T00:00:00Z"), parse_time("2030-02-01T00:00:00Z")
+    ))
+    assert [o["id"] for o in occurrences] == [
+        "series-1@20300107T090000Z",
+        "series-1@20300109T090000Z",
+    ]
+
+
+def test_iter_occurrences_is_lazy():
+    series = make_series("FREQ=DAILY")
+    generator = iter_occurrences(
+        series, parse_time("2030-01-01T00:00:00Z"), parse_time("2031-01-01T00:00:00Z")
+    )
+    assert next(generator)["id"] == "series-1@20300107T090000Z"
+
+
+@pytest.mark.parametrize("rule,start", [
+    ("FREQ=DAILY;INTERVAL=3", "2020-01-31T09:00:00Z"),
+    ("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH", "2020-01-31T09:00:00Z"),
+    ("FREQ=WEEKLY;INTERVAL=3;BYDAY=SU,TU;WKST=SU", "2021-03-15T23:00:00+05:00"),
+    ("FREQ=MONTHLY", "2019-08-31T00:00:00Z"),
+    ("FREQ=MONTHLY;INTERVAL=2;BYDAY=-1FR", "2020-01-31T09:00:00Z"),
+    ("FREQ=YEARLY", "2020-02-29T22:30:00Z"),
+    ("FREQ=WEEKLY;UNTIL=20350101T000000Z", "2020-01-31T09:00:00Z"),
+])
+def test_expansion_from_fast_forwarded_start_matches_full_expansion(rule, start):
+    series = make_series(rule, start=start, end=(parse_time(start) + timedelta(hours=8)).isoformat())
+    full = build_rule(rule, parse_time(start))
+    for window_start in ("2024-02-28T00:00:00Z", "2026-07-31T12:00:00Z", "2031-12-30T00:00:00Z"):
+        window_start = parse_time(window_start)
+        window_end = window_start + timedelta(days=120)
+        expected = full.between(window_start - timedelta(hours=8), window_end, inc=False)
+        occurrences = iter_occurrences(series, window_start, window_end)
+        assert [parse_time(o["start_time"]) for o in occurrences] == expected
+        for start_time in expected[:3]:
+            assert occurrence_at(series, start_time) is not None
+
+
+def test_fast_forward_keeps_whole_periods():
+    start = parse_time("2020-01-31T09:00:00Z")
+    target = parse_time("2030-06-15T00:00:00Z")
+    assert fast_forward(parse_rule("FREQ=WEEKLY;INTERVAL=2"), start, target) == parse_time("2030-06-07T09:00:00Z")
+    # June has no 31st, so the last whole month on the 31st is May
+    assert fast_forward(parse_rule("FREQ=MONTHLY"), start, target) == parse_time("2030-05-31T09:00:00Z")
+    assert fast_forward(parse_rule("FREQ=DAILY;COUNT=10"), start, target) == start
+    assert fast_forward(parse_rule("FREQ=DAILY"), start, start - timedelta(days=1)) == start
+
+
+def test_far_window_costs_the_same_as_a_near_one():
+    series = make_series("FREQ=DAILY", start="2020-01-01T09:00:00Z", end="2020-01-01T17:00:00Z")
+    began = time.perf_counter()
+    occurrences = list(iter_occurrences(
+        series, parse_time("9000-01-01T00:00:00Z"), parse_time("9000-04-01T00:00:00Z")
+    ))
+    assert len(occurrences) == 90
+    assert occurrence_at(series, parse_time("9990-01-01T09:00:00Z")) is not None
+    assert time.perf_counter() - began < 1
+
+
+def test_series_bounds():
+    assert series_bounds(make_series("FREQ=WEEKLY"))[1] is None
+
+    start, end = series_bounds(make_series("FREQ=WEEKLY;COUNT=3"))
+    assert start == parse_time("2030-01-07T09:00:00Z").timestamp()
+    assert end == parse_time("2030-01-21T17:00:00Z").timestamp()
+
+
+def test_series_bounds_treats_long_until_as_unbounded():
+    series = make_series("FREQ=DAILY;UNTIL=99991231T000000Z")
+    assert series_bounds(series)[1] is None
+
+
+def test_occurrence_ids_round_trip():
+    start = parse_time("2030-01-14T09:00:00Z")
+    event_id = occurrence_id("series-1", start)
+    assert split_occurrence_id(event_id) == ("series-1", start)
+    assert split_occurrence_id("5f1d3c2e-plain-uuid") is None
+    assert split_occurrence_id("series-1@not-a-stamp") is None
+
+
+def test_occurrence_at():
+    series = make_series("FREQ=WEEKLY", exdates=["20300121T090000Z"])
+    occurrence = occurrence_at(series, parse_time("2030-01-14T09:00:00Z"))
+    assert occurrence["end_time"] == "2030-01-14T17:00:00+00:00"
+    assert occurrence_at(series, parse_time("2030-01-15T09:00:00Z")) is None
+    assert occurrence_at(series, parse_time("2030-01-21T09:00:00Z")) is None
+    assert occurrence_at(series, parse_time("2030-01-14T09:00:00Z") + timedelta(minutes=1)) is None
+
+
+def test_occurrence_at_rejects_starts_outside_stored_bounds():
+    series = make_series("FREQ=WEEKLY;COUNT=3")
+    series["recurrence_start_ts"], series["recurrence_end_ts"] = series_bounds(series)
+    assert occurrence_at(series, parse_time("2030-01-21T09:00:00Z")) is not None
+    assert occurrence_at(series, parse_time("2030-01-28T09:00:00Z")) is None
+    assert occurrence_at(series, parse_time("2029-12-31T09:00:00Z")) is None
+
+
+def test_parse_time_treats_naive_as_utc():
+    assert recurrence.format_time(parse_time("2030-01-07T09:00:00")) == "2030-01-07T09:00:00+00:00"
@@ -0,0 +1,86 @@
+import pytest
+
+import search
+from search import build_match, facets_pipeline, format_facets, parse_day, results_pipeline
+
+
+def stage_names(pipeline):
+    return [next(iter(stage)) for stage in pipeline]
+
+
+@pytest.mark.parametrize("day,number", [
+    ("sun", 1), ("Sunday", 1), ("MON", 2), ("monday", 2), (" sat ", 7),
+])
+def test_parse_day(day, number):
+    assert parse_day(day) == number
+
+
+@pytest.mark.parametrize("day", ["monkey", "mo", "tues", "", "8"])
+def test_parse_day_rejects_anything_else(day):
+    with pytest.raises(ValueError):
+        parse_day(day)
+
+
+def test_build_match():
+    assert build_match("user-1") == {
+        "status": "SWAPPABLE", "user_id": {"$ne": "user-1"}, "recurrence": None,
+    }
+    match = build_match("user-1", "night", ["owner-1"])
+    assert match["$or"] == [{"$text": {"$search": "night"}}, {"user_id": {"$in": ["owner-1"]}}]
+
+
+def test_results_pipeline_sorts_straight_after_match_without_filters():
+    pipeline = results_pipeline(build_match("user-1"), "UTC", offset=40, limit=20)
+    assert stage_names(pipeline)[:4] == ["$match", "$sort", "$skip", "$limit"]
+    assert pipeline[1] == {"$sort": {"start_ts": 1}}
+    assert pipeline[2:4] == [{"$skip": 40}, {"$limit": 20}]
+    assert pipeline[-1]["$project"]["start_ts"] == 0
+
+
+def test_results_pipeline_filters_before_paging():
+    pipeline = results_pipeline(
+        build_match("user-1", "night", []), "Europe/Berlin", 0, 20,
+        day=2, hour=7, owner_timezone="Asia/Tokyo", text_search=True,
+    )
+    names = stage_names(pipeline)
+    assert names.index("$lookup") < names.index("$sort")
+    assert {"$match": {"_day": 2}} in pipeline
+    assert {"$match": {"_hour": 6}} in pipeline
+    assert pipeline[pipeline.index({"$match": {"_hour": 6}}) + 2] == {"$sort": {"_score": -1, "start_ts": 1}}
+    owner_lookup = pipeline[1]["$lookup"]["pipeline"][0]["$match"]
+    assert owner_lookup["timezone"] == "Asia/Tokyo"
+
+
+def test_facets_pipeline_always_computes_local_time():
+    pipeline = facets_pipeline(build_match("user-1"), "UTC")
+    assert stage_names(pipeline) == ["$match", "$set", "$set", "$facet"]
+    start = pipeline[1]["$set"]["_start"]["$dateFromString"]
+    assert start["onError"] is None and start["onNull"] is None
+    assert set(pipeline[-1]["$facet"]) == {"total", "day", "hour", "owner_timezone"}
+
+
+def test_format_facets_labels_hours_and_drops_unparsable_starts():
+    facets = {
+        "total": [{"count": 8}],
+        "day": [{"_id": 2, "count": 6}, {"_id": None, "count": 1}, {"_id": 7, "count": 1}],
+        "hour": [{"_id": 18, "count": 2}, {"_id": None, "count": 1}, {"_id": 0, "count": 5}],
+        "owner_timezone": [{"_id": "UTC", "count": 7}, {"_id": "Asia/Tokyo", "count": 1}],
+    }
+    assert format_facets(facets) == {
+        "total": 8,
+        "facets": {
+            "day": {"mon": 6, "sat": 1},
+            "hour": {"00-06": 5, "18-24": 2},
+            "owner_timezone": {"UTC": 7, "Asia/Tokyo": 1},
+        },
+    }
+
+
+def test_format_facets_with_no_matches():
+    empty = {"total": [], "day": [], "hour": [], "owner_timezone": []}
+    assert format_facets(empty) == {"total": 0, "facets": {"day": {}, "hour": {}, "owner_timezone": {}}}
+
+
+def test_hour_labels_cover_the_day():
+    labels = [search.hour_label(hour) for hour in range(0, 24, search.HOUR_BUCKET)]
+    assert labels == ["00-06", "06-12", "12-18", "18-24"]
@@ -0,0 +1,101 @@
+import uuid
+
+import pytest
+
+from recurrence import parse_time
+from slotstore import SlotStore
+
+
+def make_event(n, user="user-a", status="SWAPPABLE", event_id=None, title="Shift"):
+    return {
+        "id": event_id or str(uuid.UUID(int=n + 1)),
+        "user_id": user,
+        "title": title,
+        "start_time": f"2030-01-{n + 1:02d}T09:00:00+00:00",
+        "end_time": f"2030-01-{n + 1:02d}T17:00:00+00:00",
+        "status": status,
+    }
+
+
+@pytest.fixture
+def events():
+    return [
+        make_event(0, "user-a", "SWAPPABLE"),
+        make_event(1, "user-b", "SWAPPABLE"),
+        make_event(2, "user-b", "BUSY"),
+        make_event(3, "user-c", "SWAP_PENDING"),
+        make_event(4, "user-a", "SWAPPABLE", event_id="series-1@20300105T090000Z"),
+    ]
+
+
+def test_rows_round_trip(events):
+    store = SlotStore.from_events(events)
+    assert len(store) == 5
+    assert list(store.rows()) == events
+
+
+def test_grows_past_initial_capacity():
+    store = SlotStore(capacity=2)
+    events = [make_event(n) for n in range(9)]
+    for event in events:
+        store.add(event)
+    assert list(store.rows()) == events
+
+
+def test_add_existing_id_replaces_row(events):
+    store = SlotStore.from_events(events)
+    store.add({**events[1], "title": "Renamed", "status": "BUSY"})
+    assert len(store) == 5
+    assert list(store.rows([1]))[0]["title"] == "Renamed"
+    assert list(store.rows([1]))[0]["status"] == "BUSY"
+
+
+def test_select_filters(events):
+    store = SlotStore.from_events(events)
+    assert list(store.select(status="SWAPPABLE")) == [0, 1, 4]
+    assert list(store.select(status="SWAPPABLE", exclude_user_id="user-a")) == [1]
+    assert list(store.select(user_id="user-b")) == [1, 2]
+    assert list(store.select(user_id="nobody")) == []
+
+    # Overlap: slots 1 and 2 fall inside, slot 3 starts exactly at the end
+    start = parse_time(events[1]["start_time"]).timestamp()
+    end = parse_time(events[3]["start_time"]).timestamp()
+    assert list(store.select(start=start, end=end)) == [1, 2]
+
+
+def test_columns_are_views(events):
+    store = SlotStore.from_events(events)
+    rows = store.select(status="SWAPPABLE")
+    assert store.start.base is not None
+    store.set_status(events[0]["id"], "SWAP_PENDING")
+    assert list(store.select(status="SWAPPABLE")) == [r for r in rows if r != 0]
+
+
+def test_remove_moves_last_row_into_hole(events):
+    store = SlotStore.from_events(events)
+    store.remove(events[1]["id"])
+
+    assert len(store) == 4
+    assert events[1]["id"] not in store
+    assert sorted(r["id"] for r in store.rows()) == sorted(
+        e["id"] for e in events if e is not events[1]
+    )
+    # The occurrence id that moved into row 1 still round-trips
+    assert store.event_id(1) == "series-1@20300105T090000Z"
+
+    store.remove("series-1@20300105T090000Z")
+    store.set_status(events[3]["id"], "BUSY")
+    assert [r["status"] for r in store.rows()] == ["SWAPPABLE", "BUSY", "BUSY"]
+
+
+def test_remove_last_row(events):
+    store = SlotStore.from_events(events)
+    store.remove(events[-1]["id"])
+    assert list(store.rows()) == events[:-1]
+
+
+def test_users_and_titles_are_interned(events):
+    store = SlotStore.from_events(events)
+    assert store.users == ["user-a", "user-b", "user-c"]
+    assert list(store.user) == [0, 1, 1, 2, 0]
+    assert store.nbytes() == 5 * (16 + 8 + 8 + 4 + 1)